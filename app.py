@@ -4,45 +4,158 @@ A Flask web application for reading practice with speech recognition.
 """
 
 import os
+import io
+import re
+import sys
+import time
+import atexit
+import threading
+import codecs
+import hashlib
+import functools
 import logging
-from flask import Flask, render_template, request, jsonify, url_for, redirect
+import orjson
+import redis
+from cachetools import LRUCache, TTLCache, cached
+from flask import Flask, render_template, request, jsonify, url_for, redirect, abort, make_response
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from flask_caching import Cache
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateColumn
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import uuid
 
-vercel_sessions = {}
+_WORD_RE = re.compile(r'\S+')
+_PUNCT_RE = re.compile(r'[^\w\s]')
+
+# Progress entries waiting to be written, keyed by session id
+_pending_progress = {}
+_first_queued_at = {}
+_pending_progress_lock = threading.Lock()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                            option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+IS_VERCEL = bool(os.environ.get('VERCEL'))
+
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-change-in-prod')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///reading_assistant.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+IS_SQLITE = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+IS_MEMORY_DB = IS_SQLITE and app.config['SQLALCHEMY_DATABASE_URI'] in ('sqlite://', 'sqlite:///:memory:')
+# In-memory SQLite runs on a single StaticPool connection, which takes no pool sizing
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {} if IS_MEMORY_DB else {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800
+}
+if IS_SQLITE:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {'check_same_thread': False}
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['UPLOAD_CHUNK_SIZE'] = 64 * 1024
+app.config['PROGRESS_FLUSH_SIZE'] = 32
+app.config['PROGRESS_FLUSH_INTERVAL'] = 2.0
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+app.config['SESSION_STORE_TTL'] = 3600
+app.config['SESSION_STORE_MAXSIZE'] = 10000
+app.config['WORD_CACHE_MAX_WORDS'] = 1_000_000
 
 db = SQLAlchemy(app)
+cache = Cache(app)
 CORS(app)
 
-if not os.environ.get('VERCEL'):
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed during writes; NORMAL sync is safe under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+if IS_SQLITE:
+    with app.app_context():
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+
+if not IS_VERCEL:
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+class TextBlob(db.Model):
+    __tablename__ = 'text_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    
+    @classmethod
+    def for_content(cls, content, sha256=None):
+        # Identical texts are stored once and shared between sessions. The
+        # blob is written to the current transaction straight away, so later
+        # lookups of the same text find it even before the session is flushed
+        if sha256 is None:
+            sha256 = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        
+        # Insert-or-ignore, so concurrent uploads of the same text cannot both
+        # miss the blob and then collide on its primary key
+        insert = _INSERTS.get(db.session.get_bind().dialect.name)
+        if insert is None:
+            blob = db.session.get(cls, sha256)
+            if blob is None:
+                blob = cls(sha256=sha256, content=content)
+                db.session.add(blob)
+                db.session.flush()
+            return blob
+        
+        db.session.execute(
+            insert(cls).values(sha256=sha256, content=content)
+            .on_conflict_do_nothing(index_elements=['sha256'])
+        )
+        return db.session.get(cls, sha256)
+
 class ReadingSession(db.Model):
     __tablename__ = 'reading_sessions'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     filename = db.Column(db.String(255), nullable=False)
-    text_content = db.Column(db.Text, nullable=False)
+    text_sha256 = db.Column(db.String(64), db.ForeignKey('text_blobs.sha256'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     total_words = db.Column(db.Integer, nullable=False)
     current_word_index = db.Column(db.Integer, default=0)
+    progress_percentage = db.Column(db.Float, db.Computed(
+        'COALESCE(ROUND((current_word_index + 1) * 100.0 / NULLIF(total_words, 0), 2), 0)'
+    ))
     
+    text_blob = db.relationship('TextBlob', lazy=True)
     progress_entries = db.relationship('ReadingProgress', backref='session', lazy=True)
     
+    @property
+    def text_content(self):
+        return self.text_blob.content
+    
+    @text_content.setter
+    def text_content(self, value):
+        # Inserts the blob as a side effect, even if this session is never saved
+        self.text_blob = TextBlob.for_content(value)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -51,11 +164,24 @@ class ReadingSession(db.Model):
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'total_words': self.total_words,
             'current_word_index': self.current_word_index,
-            'progress_percentage': round(((self.current_word_index + 1) / self.total_words) * 100, 2) if self.total_words > 0 else 0
+            'progress_percentage': self._progress_percentage()
         }
+    
+    def _progress_percentage(self):
+        # The computed column is only filled in once the row is flushed, and
+        # SQLite may hand back a whole number as an int
+        if self.progress_percentage is not None:
+            return float(self.progress_percentage)
+        if not self.total_words:
+            return 0.0
+        return round(((self.current_word_index or 0) + 1) / self.total_words * 100, 2)
 
 class ReadingProgress(db.Model):
     __tablename__ = 'reading_progress'
+    __table_args__ = (
+        db.Index('ix_rp_session_correct', 'session_id', 'is_correct'),
+        db.Index('ix_rp_session_ts', 'session_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36), db.ForeignKey('reading_sessions.id'), nullable=False)
@@ -66,19 +192,78 @@ class ReadingProgress(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     confidence_score = db.Column(db.Float)
 
+# Built once at import so hot API routes reuse the statement and its compiled form
+_SESSION_BY_ID = db.select(ReadingSession).where(ReadingSession.id == db.bindparam('session_id'))
+
+def _get_session_or_404(session_id):
+    session = db.session.execute(_SESSION_BY_ID, {'session_id': session_id}).scalar_one_or_none()
+    if session is None:
+        abort(404)
+    return session
+
+class SessionStore:
+    """Reading sessions kept outside the database on Vercel.
+
+    Uses Redis when a URL is given so every worker sees the same sessions,
+    otherwise falls back to a bounded process-local TTL cache.
+    """
+    
+    def __init__(self, redis_url=None, ttl=3600, maxsize=10000):
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(redis_url) if redis_url else None
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+    
+    def get(self, session_id):
+        if self._redis is None:
+            with self._lock:
+                return self._local.get(session_id)
+        
+        data = self._redis.get(f'sess:{session_id}')
+        return orjson.loads(data) if data is not None else None
+    
+    def set(self, session_id, session_data):
+        if self._redis is None:
+            with self._lock:
+                self._local[session_id] = session_data
+        else:
+            self._redis.set(f'sess:{session_id}', orjson.dumps(session_data), ex=self.ttl)
+
+vercel_sessions = SessionStore(os.environ.get('REDIS_URL'),
+                               ttl=app.config['SESSION_STORE_TTL'],
+                               maxsize=app.config['SESSION_STORE_MAXSIZE'])
+
 @app.route('/')
 def index():
     try:
-        if os.environ.get('VERCEL'):
+        if IS_VERCEL:
             return render_template('index.html', recent_sessions=[])
         
-        recent_sessions = ReadingSession.query.order_by(ReadingSession.created_at.desc()).limit(5).all()
-        sessions_to_show = recent_sessions if recent_sessions else []
-        return render_template('index.html', recent_sessions=sessions_to_show)
+        return render_template('index.html', recent_sessions=_recent_sessions())
     except Exception as e:
         logger.error(f"Error loading index page: {str(e)}")
         return render_template('error.html', error="Failed to load page"), 500
 
+@cache.memoize(timeout=30)
+def _recent_sessions():
+    # Only the columns to_dict() needs; skips loading each session's full text
+    recent_sessions = ReadingSession.query.options(db.load_only(
+        ReadingSession.id,
+        ReadingSession.filename,
+        ReadingSession.created_at,
+        ReadingSession.completed_at,
+        ReadingSession.total_words,
+        ReadingSession.current_word_index,
+        ReadingSession.progress_percentage
+    )).order_by(ReadingSession.created_at.desc()).limit(5).all()
+    return [session.to_dict() for session in recent_sessions]
+
+@app.template_filter('datetime')
+def format_datetime(value, fmt='%m/%d %H:%M'):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.strftime(fmt)
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
@@ -92,32 +277,32 @@ def upload_file():
         if file and file.filename.lower().endswith('.txt'):
             filename = secure_filename(file.filename)
             
-            # Read file content
-            content = file.read().decode('utf-8')
-            words = content.split()
+            content, total_words, sha256 = _read_upload(file.stream)
             
             session_id = str(uuid.uuid4())
             
-            if os.environ.get('VERCEL'):
-                vercel_sessions[session_id] = {
+            if IS_VERCEL:
+                vercel_sessions.set(session_id, {
                     'id': session_id,
                     'filename': filename,
                     'text_content': content,
-                    'total_words': len(words),
+                    'words': content.split(),
+                    'total_words': total_words,
                     'current_word_index': 0,
                     'created_at': datetime.utcnow()
-                }
+                })
                 logger.info(f"Created Vercel session: {session_id}")
             else:
                 session = ReadingSession(
                     id=session_id,
                     filename=filename,
-                    text_content=content,
-                    total_words=len(words)
+                    text_blob=TextBlob.for_content(content, sha256),
+                    total_words=total_words
                 )
                 
                 db.session.add(session)
                 db.session.commit()
+                cache.delete_memoized(_recent_sessions)
                 logger.info(f"Created session: {session_id}")
             
             return jsonify({
@@ -129,6 +314,7 @@ def upload_file():
         return jsonify({'error': 'Please upload a .txt file'}), 400
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"File upload error: {str(e)}")
         return jsonify({'error': 'Failed to process file'}), 500
 
@@ -146,33 +332,35 @@ def upload_text():
         if not text_content:
             return jsonify({'error': 'Text cannot be empty'}), 400
         
-        words = text_content.split()
+        total_words = _count_words(text_content)
         
-        if len(words) == 0:
+        if total_words == 0:
             return jsonify({'error': 'Text must contain at least one word'}), 400
         
         session_id = str(uuid.uuid4())
         
-        if os.environ.get('VERCEL'):
-            vercel_sessions[session_id] = {
+        if IS_VERCEL:
+            vercel_sessions.set(session_id, {
                 'id': session_id,
                 'filename': filename,
                 'text_content': text_content,
-                'total_words': len(words),
+                'words': text_content.split(),
+                'total_words': total_words,
                 'current_word_index': 0,
                 'created_at': datetime.utcnow()
-            }
+            })
             logger.info(f"Created Vercel text session: {session_id}")
         else:
             session = ReadingSession(
                 id=session_id,
                 filename=filename,
-                text_content=text_content,
-                total_words=len(words)
+                text_blob=TextBlob.for_content(text_content),
+                total_words=total_words
             )
             
             db.session.add(session)
             db.session.commit()
+            cache.delete_memoized(_recent_sessions)
             logger.info(f"Created text session: {session_id}")
         
         return jsonify({
@@ -182,16 +370,28 @@ def upload_text():
         })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Text processing error: {str(e)}")
         return jsonify({'error': 'Failed to process text'}), 500
 
+def _template_version(*names):
+    # Changes whenever a deploy changes these templates, so ETags issued for
+    # the previous version stop matching
+    digest = hashlib.sha256()
+    for name in names:
+        source, _, _ = app.jinja_loader.get_source(app.jinja_env, name)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()[:8]
+
+_READING_PAGE_VERSION = _template_version('reading.html', 'base.html')
+
 @app.route('/session/<session_id>')
 def reading_session(session_id):
     try:
-        if os.environ.get('VERCEL'):
-            if session_id in vercel_sessions:
-                session_data = vercel_sessions[session_id]
-                words = session_data['text_content'].split()
+        if IS_VERCEL:
+            session_data = vercel_sessions.get(session_id)
+            if session_data is not None:
+                words = session_data['words']
                 session = type('obj', (object,), {
                     'id': session_data['id'],
                     'filename': session_data['filename'],
@@ -207,13 +407,31 @@ def reading_session(session_id):
                 # Session not found, redirect to home
                 return redirect(url_for('index'))
         else:
-            session = ReadingSession.query.get_or_404(session_id)
-            words = session.text_content.split()
+            session = _get_session_or_404(session_id)
+            _flush_progress(session_id)
             
-            return render_template('reading.html', 
-                                 session=session, 
-                                 words=words,
-                                 current_index=session.current_word_index)
+            # The page only changes with the reading position and the templates,
+            # so it is cached and revalidated by ETag on those and the text hash
+            etag = (f'{_READING_PAGE_VERSION}-{session.id}-'
+                    f'{session.current_word_index}-{session.text_sha256[:16]}')
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                # One entry per session, replaced when the position moves, so
+                # earlier positions do not pile up in the cache
+                cache_key = f'reading_page:{session.id}'
+                cached_etag, html = cache.get(cache_key) or (None, None)
+                if cached_etag != etag:
+                    html = render_template('reading.html', 
+                                           session=session, 
+                                           words=_session_words(session.text_sha256),
+                                           current_index=session.current_word_index)
+                    cache.set(cache_key, (etag, html), timeout=300)
+                response = make_response(html)
+            
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
     except Exception as e:
         logger.error(f"Error loading reading session {session_id}: {str(e)}")
         return render_template('error.html', error="Session not found"), 404
@@ -221,20 +439,28 @@ def reading_session(session_id):
 @app.route('/api/sessions/<session_id>/progress', methods=['POST'])
 def update_progress(session_id):
     try:
-        if os.environ.get('VERCEL'):
+        if IS_VERCEL:
             return jsonify({'error': 'Progress tracking not available'}), 400
             
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid progress event'}), 400
+        
         session_id = data.get('session_id')
-        word_index = data.get('word_index')
+        session = _get_session_or_404(session_id)
+        
+        # The expected word comes from the stored text, not the client
+        expected_words = _expected_words(session.text_sha256)
+        error = _progress_event_error(data, len(expected_words))
+        if error:
+            return jsonify({'error': error}), 400
+        
+        word_index = data['word_index']
         spoken_word = data.get('spoken_word', '')
-        expected_word = data.get('expected_word', '')
         confidence = data.get('confidence', 0.0)
+        expected_word = _session_words(session.text_sha256)[word_index]
         
-        session = ReadingSession.query.get_or_404(session_id)
-        session.current_word_index = word_index
-        
-        is_correct = _words_match(spoken_word.lower(), expected_word.lower())
+        is_correct = _words_match(_normalise_word(spoken_word), expected_words[word_index])
         
         progress = ReadingProgress(
             session_id=session_id,
@@ -242,11 +468,13 @@ def update_progress(session_id):
             expected_word=expected_word,
             spoken_word=spoken_word,
             is_correct=is_correct,
+            timestamp=datetime.utcnow(),
             confidence_score=confidence
         )
         
-        db.session.add(progress)
-        db.session.commit()
+        if _queue_progress(session_id, progress):
+            _flush_progress(session_id)
+        _flush_stale_progress()
         
         return jsonify({
             'success': True,
@@ -255,25 +483,84 @@ def update_progress(session_id):
         })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Progress update error: {str(e)}")
         return jsonify({'error': 'Failed to update progress'}), 500
 
+@app.route('/api/sessions/<session_id>/progress/bulk', methods=['POST'])
+def bulk_update_progress(session_id):
+    try:
+        if IS_VERCEL:
+            return jsonify({'error': 'Progress tracking not available'}), 400
+        
+        data = request.get_json()
+        events = data.get('events') if isinstance(data, dict) else None
+        
+        if not isinstance(events, list) or not events:
+            return jsonify({'error': 'No progress events provided'}), 400
+        
+        session = _get_session_or_404(session_id)
+        expected_words = _expected_words(session.text_sha256)
+        session_words = _session_words(session.text_sha256)
+        timestamp = datetime.utcnow()
+        
+        rows = []
+        for entry in events:
+            error = _progress_event_error(entry, len(expected_words))
+            if error:
+                return jsonify({'error': error}), 400
+            
+            word_index = entry['word_index']
+            spoken_word = entry.get('spoken_word', '')
+            rows.append({
+                'session_id': session_id,
+                'word_index': word_index,
+                'expected_word': session_words[word_index],
+                'spoken_word': spoken_word,
+                'is_correct': _words_match(_normalise_word(spoken_word), expected_words[word_index]),
+                'timestamp': timestamp,
+                'confidence_score': entry.get('confidence', 0.0)
+            })
+        
+        # Keep buffered single events ahead of the replayed batch
+        _flush_progress(session_id)
+        db.session.execute(db.insert(ReadingProgress), rows)
+        session.current_word_index = rows[-1]['word_index']
+        # Commit before responding so a failed write is reported as one
+        db.session.commit()
+        _flush_stale_progress()
+        
+        return jsonify({
+            'success': True,
+            'recorded': len(rows),
+            'correct': sum(row['is_correct'] for row in rows),
+            'progress_percentage': round(((session.current_word_index + 1) / session.total_words) * 100, 2)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Bulk progress update error: {str(e)}")
+        return jsonify({'error': 'Failed to update progress'}), 500
+
 @app.route('/api/sessions/<session_id>/complete', methods=['POST'])
 def complete_session(session_id):
     try:
-        if os.environ.get('VERCEL'):
+        if IS_VERCEL:
             return jsonify({'error': 'Session completion not available'}), 400
             
-        session = ReadingSession.query.get_or_404(session_id)
+        session = _get_session_or_404(session_id)
+        _flush_progress(session_id)
         session.completed_at = datetime.utcnow()
         db.session.commit()
+        _words_match.cache_clear()
         
-        correct_words = ReadingProgress.query.filter_by(
-            session_id=session_id, 
-            is_correct=True
-        ).count()
-        
-        total_attempts = ReadingProgress.query.filter_by(session_id=session_id).count()
+        correct_words, total_attempts = db.session.execute(
+            db.select(
+                db.func.sum(db.case((ReadingProgress.is_correct, 1), else_=0)),
+                db.func.count()
+            ).where(ReadingProgress.session_id == session_id)
+        ).one()
+        correct_words = int(correct_words or 0)
         accuracy = (correct_words / total_attempts * 100) if total_attempts > 0 else 0
         
         return jsonify({
@@ -287,20 +574,161 @@ def complete_session(session_id):
         })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Session completion error: {str(e)}")
         return jsonify({'error': 'Failed to complete session'}), 500
 
-def _words_match(spoken, expected):
-    if spoken == expected:
-        return True
+@cached(LRUCache(maxsize=app.config['WORD_CACHE_MAX_WORDS'], getsizeof=len), lock=threading.Lock())
+def _expected_words(text_sha256):
+    # Words normalised the way the reading page compares them, interned so
+    # repeated words share one string
+    return tuple(_normalise_word(word) for word in _session_words(text_sha256))
+
+def _progress_event_error(entry, word_count):
+    # Returns why a progress event is malformed, or None if it is usable
+    if not isinstance(entry, dict):
+        return 'Invalid progress event'
+    
+    word_index = entry.get('word_index')
+    # bool is an int subclass, but True is not a word index
+    if isinstance(word_index, bool) or not isinstance(word_index, int) or not 0 <= word_index < word_count:
+        return 'Invalid word index'
     
-    variations = [
-        spoken.replace('ing', 'in'),
-        spoken.replace('ed', 'd'),
-        spoken.replace('th', 'f'),
-    ]
+    if not isinstance(entry.get('spoken_word', ''), str):
+        return 'Invalid spoken word'
     
-    return expected in variations
+    confidence = entry.get('confidence', 0.0)
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        return 'Invalid confidence'
+    return None
+
+def _normalise_word(word):
+    # Spoken and expected words are compared lower-cased without punctuation
+    return sys.intern(_PUNCT_RE.sub('', word.lower()))
+
+def _queue_progress(session_id, progress):
+    # Buffer a progress entry; returns True once the session's buffer is due for a flush
+    with _pending_progress_lock:
+        pending = _pending_progress.setdefault(session_id, [])
+        pending.append(progress)
+        first_queued = _first_queued_at.setdefault(session_id, time.monotonic())
+        return (len(pending) >= app.config['PROGRESS_FLUSH_SIZE'] or
+                time.monotonic() - first_queued >= app.config['PROGRESS_FLUSH_INTERVAL'])
+
+def _flush_progress(session_id):
+    # Write and commit buffered progress for a session in one batch. If the
+    # write fails the entries go back in the buffer, since their requests have
+    # already been answered
+    with _pending_progress_lock:
+        pending = _pending_progress.pop(session_id, [])
+        first_queued = _first_queued_at.pop(session_id, None)
+    
+    if not pending:
+        return 0
+    
+    try:
+        db.session.bulk_save_objects(pending)
+        db.session.execute(
+            db.update(ReadingSession)
+            .where(ReadingSession.id == session_id)
+            .values(current_word_index=pending[-1].word_index)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        with _pending_progress_lock:
+            _pending_progress[session_id] = pending + _pending_progress.get(session_id, [])
+            _first_queued_at[session_id] = first_queued
+        raise
+    return len(pending)
+
+def _flush_stale_progress():
+    # Readers may stop without completing, so buffers past the flush interval
+    # are written on the next progress update for any session. A failure is
+    # only logged: it must not fail the unrelated request, and the entries
+    # stay buffered for the next sweep
+    cutoff = time.monotonic() - app.config['PROGRESS_FLUSH_INTERVAL']
+    with _pending_progress_lock:
+        stale = [session_id for session_id, first_queued in _first_queued_at.items()
+                 if first_queued <= cutoff]
+    
+    for session_id in stale:
+        try:
+            _flush_progress(session_id)
+        except Exception as e:
+            logger.error(f"Failed to flush progress for {session_id}: {str(e)}")
+
+@atexit.register
+def _flush_all_progress():
+    with app.app_context():
+        for session_id in list(_pending_progress):
+            try:
+                _flush_progress(session_id)
+            except Exception as e:
+                logger.error(f"Failed to flush pending progress: {str(e)}")
+
+# Bounded by the number of words held rather than texts, since one text can
+# be up to MAX_CONTENT_LENGTH; a text larger than the whole cache is not cached
+@cached(LRUCache(maxsize=app.config['WORD_CACHE_MAX_WORDS'], getsizeof=len), lock=threading.Lock())
+def _session_words(text_sha256):
+    # Texts are content-addressed and never change, so the split is cached per hash
+    text_content = db.session.execute(
+        db.select(TextBlob.content).where(TextBlob.sha256 == text_sha256)
+    ).scalar_one()
+    return tuple(text_content.split())
+
+def _count_words(text):
+    # Counts whitespace-separated words without building the list split() would
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+def _read_upload(stream):
+    # Decode in chunks, counting words and hashing as we go, instead of holding
+    # the raw bytes, the decoded text and a split word list in memory at once
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    digest = hashlib.sha256()
+    buffer = io.StringIO()
+    chunk_size = app.config['UPLOAD_CHUNK_SIZE']
+    total_words = 0
+    in_word = False
+    
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+        text = decoder.decode(chunk)
+        if not text:
+            continue
+        buffer.write(text)
+        total_words += _count_words(text)
+        # A word split across the chunk boundary was counted twice
+        if in_word and not text[0].isspace():
+            total_words -= 1
+        in_word = not text[-1].isspace()
+    
+    # Raises UnicodeDecodeError on a truncated multi-byte sequence
+    text = decoder.decode(b'', final=True)
+    buffer.write(text)
+    
+    return buffer.getvalue(), total_words, digest.hexdigest()
+
+@functools.lru_cache(maxsize=16384)
+def _words_match(spoken, expected):
+    return (spoken == expected or
+            expected == spoken.replace('ing', 'in') or
+            expected == spoken.replace('ed', 'd') or
+            expected == spoken.replace('th', 'f'))
+
+@app.teardown_request
+def _commit_request(exc):
+    # Write handlers commit before responding; this only rolls back failed
+    # requests and commits anything left over. Teardown must not raise, as the
+    # response has already been built
+    try:
+        if exc is None:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Request commit error: {str(e)}")
 
 @app.errorhandler(404)
 def not_found_error(error):
@@ -311,15 +739,85 @@ def internal_error(error):
     db.session.rollback()
     return render_template('error.html', error="Internal server error"), 500
 
+def _migrate_text_blobs(connection):
+    # Sessions created before text_blobs existed stored their text inline
+    columns = {column['name'] for column in db.inspect(connection).get_columns('reading_sessions')}
+    if 'text_content' not in columns:
+        return
+    
+    if 'text_sha256' not in columns:
+        connection.execute(db.text(
+            'ALTER TABLE reading_sessions ADD COLUMN text_sha256 VARCHAR(64) REFERENCES text_blobs (sha256)'
+        ))
+    
+    rows = connection.execute(db.text('SELECT id, text_content FROM reading_sessions')).all()
+    for session_id, content in rows:
+        sha256 = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        exists = connection.execute(
+            db.select(TextBlob.sha256).where(TextBlob.sha256 == sha256)
+        ).first()
+        if exists is None:
+            connection.execute(db.insert(TextBlob).values(sha256=sha256, content=content))
+        connection.execute(
+            db.update(ReadingSession).where(ReadingSession.id == session_id).values(text_sha256=sha256)
+        )
+    
+    connection.execute(db.text('ALTER TABLE reading_sessions DROP COLUMN text_content'))
+    logger.info(f"Moved text of {len(rows)} sessions to text_blobs")
+
+def _needs_text_blob_migration():
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table('reading_sessions'):
+        return False
+    return 'text_content' in {column['name'] for column in inspector.get_columns('reading_sessions')}
+
+def _upgrade_schema():
+    # create_all() only creates missing tables, so columns and indexes added
+    # to existing models are created here for databases made by older versions
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}'))
+                    logger.info(f"Added column {table.name}.{column.name}")
+            
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    logger.info(f"Added index {index.name}")
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Move session text into text_blobs, then add any missing columns and indexes."""
+    # Run once by hand: it drops reading_sessions.text_content, so it is not
+    # done at import in every worker, and any error aborts the command
+    db.create_all()
+    with db.engine.begin() as connection:
+        if db.inspect(connection).has_table('reading_sessions'):
+            _migrate_text_blobs(connection)
+    _upgrade_schema()
+    logger.info("Database upgraded")
+
 def create_tables():
     with app.app_context():
         try:
             db.create_all()
+            if _needs_text_blob_migration():
+                logger.error("Database predates text_blobs; run 'flask --app app upgrade-db'")
+                return
+            _upgrade_schema()
             logger.info("Database tables created")
         except Exception as e:
             logger.warning(f"Database init warning: {str(e)}")
 
-if not os.environ.get('VERCEL'):
+if not IS_VERCEL:
     create_tables()
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+"""
+Shared pytest fixtures for the Text Reading Assistant tests.
+"""
+
+import os
+import functools
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from flask_sqlalchemy.session import Session
+
+# The app creates its engine at import time, so the test database has to be
+# configured before it is imported. Each xdist worker is its own process, so
+# every worker gets a private in-memory database.
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+from app import app, db, cache, _pending_progress, _first_queued_at, _pending_progress_lock
+
+
+def _clear_pending_progress():
+    """Drop progress buffered by app.py so it cannot leak into another test."""
+    with _pending_progress_lock:
+        _pending_progress.clear()
+        _first_queued_at.clear()
+
+
+class _ConnectionSession(Session):
+    """Session that always uses the connection it was created with."""
+    
+    def get_bind(self, *args, **kwargs):
+        return self.bind
+
+
+# Config applied on top of app.py's defaults for the test run
+_TEST_CONFIG = (
+    ('TESTING', True),
+    ('SQLALCHEMY_TRACK_MODIFICATIONS', False),
+    ('SQLALCHEMY_ECHO', False),
+    ('SQLALCHEMY_RECORD_QUERIES', False),
+)
+
+
+# Fixtures that mean a test talks to the app or the database
+_INTEGRATION_FIXTURES = {'client', 'db_session', 'sample_session', 'readonly_session'}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--fast', action='store_true', default=False,
+                     help='run only the unit tests')
+
+
+def pytest_collection_modifyitems(config, items):
+    """Tag every test as unit or integration, and keep only unit tests under --fast."""
+    selected, deselected = [], []
+    for item in items:
+        if _INTEGRATION_FIXTURES.intersection(getattr(item, 'fixturenames', ())):
+            item.add_marker(pytest.mark.integration)
+        else:
+            item.add_marker(pytest.mark.unit)
+        
+        if config.getoption('--fast') and item.get_closest_marker('integration'):
+            deselected.append(item)
+        else:
+            selected.append(item)
+    
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+@functools.lru_cache(maxsize=None)
+def _get_app(config_items):
+    """Configure the app once per test configuration."""
+    app.config.update(dict(config_items))
+    
+    with app.app_context():
+        # Flask-SQLAlchemy reads the SQLALCHEMY_* flags above when app.py
+        # initialises it, so they only pin the defaults; turn echo off on the
+        # engine that already exists as well
+        db.engine.echo = False
+        
+        # Flask-SQLAlchemy gives in-memory SQLite a StaticPool, so every
+        # session and request shares the one connection the schema lives on.
+        # That is safe because each xdist worker is single-threaded.
+        assert isinstance(db.engine.pool, StaticPool)
+        
+        # pysqlite begins transactions lazily, which breaks SAVEPOINTs; hand
+        # transaction control to SQLAlchemy instead
+        with db.engine.connect() as connection:
+            driver_connection = connection.connection.driver_connection
+            driver_connection.isolation_level = None
+            
+            # The in-memory database is thrown away, so skip the journalling
+            # app.py sets up for the file database. StaticPool keeps this one
+            # connection for the whole run, so set the pragmas on it directly
+            # rather than in a connect listener.
+            cursor = driver_connection.cursor()
+            cursor.execute('PRAGMA synchronous=OFF')
+            cursor.execute('PRAGMA journal_mode=MEMORY')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            cursor.close()
+        event.listen(db.engine, 'begin', lambda connection: connection.exec_driver_sql('BEGIN'))
+    
+    return app, db
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _configured_app():
+    """The Flask app configured for testing."""
+    test_app, _ = _get_app(_TEST_CONFIG)
+    return test_app
+
+
+@pytest.fixture(scope='session')
+def _schema(_configured_app):
+    """Push an app context and create the schema once for the whole test run."""
+    with _configured_app.app_context():
+        db.create_all()
+        yield db
+
+
+@pytest.fixture
+def db_session(_schema):
+    """Run the test inside a transaction that is rolled back afterwards."""
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    app_session = db.session
+    
+    # Commits made by the app or the test only release a SAVEPOINT
+    db.session = db._make_scoped_session({
+        'class_': _ConnectionSession,
+        'bind': connection,
+        'join_transaction_mode': 'create_savepoint'
+    })
+    cache.clear()
+    _clear_pending_progress()
+    
+    yield db.session
+    
+    _clear_pending_progress()
+    db.session.remove()
+    db.session = app_session
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope='session')
+def _client(_configured_app):
+    """Create one test client for the whole run.
+    
+    The app sets no cookies, so nothing leaks between tests through it. It is
+    deliberately not entered as a context manager: that would keep each
+    request's context alive into the next test and delay its teardown commit.
+    """
+    return _configured_app.test_client()
+
+
+@pytest.fixture
+def client(_client, db_session):
+    """The shared test client, with the test's database transaction in place."""
+    return _client
@@ -7,31 +7,26 @@ Following testing best practices with fixtures, mocking, and edge case testing.
 """
 
 import pytest
-import json
-import tempfile
-import os
-from app import app, db, ReadingSession, ReadingProgress
+import hashlib
+from io import BytesIO
+from datetime import datetime
+from unittest import mock
+from cachetools.keys import hashkey
+from sqlalchemy.exc import OperationalError
+from werkzeug.datastructures import FileStorage
+from app import (app, db, cache, ReadingSession, ReadingProgress, TextBlob,
+                 SessionStore, _INSERTS, _PUNCT_RE, _words_match, _read_upload,
+                 _session_words)
 
 
-@pytest.fixture
-def client():
-    """Create a test client for the Flask application."""
-    # Create a temporary database for testing
-    db_fd, app.config['DATABASE'] = tempfile.mkstemp()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-    
-    os.close(db_fd)
-    os.unlink(app.config['DATABASE'])
+def assert_contains_all(data, *needles):
+    """Assert that every needle appears in data, reporting all that are missing."""
+    missing = [needle for needle in needles if needle not in data]
+    assert not missing, f"missing from response: {missing}"
 
 
 @pytest.fixture
-def sample_session():
+def sample_session(db_session):
     """Create a sample reading session for testing."""
     session = ReadingSession(
         filename='test.txt',
@@ -39,313 +34,657 @@ def sample_session():
         total_words=6
     )
     db.session.add(session)
+    db.session.flush()
+    return session
+
+
+@pytest.fixture(scope='session')
+def readonly_session(_schema):
+    """Create a reading session once for tests that only read it."""
+    session = ReadingSession(
+        filename='readonly.txt',
+        text_content='hello world this is a test',
+        total_words=6
+    )
+    db.session.add(session)
     db.session.commit()
+    # Load the attributes, then detach so the connection is released before
+    # the per-test transactions start
+    db.session.refresh(session)
+    db.session.close()
     return session
 
 
-class TestMainRoutes:
-    """Test main application routes."""
+# Main application routes
+def test_index_page(client):
+    """Test the main index page loads correctly."""
+    response = client.get('/')
+    assert response.status_code == 200
+    assert_contains_all(response.data, b'Text Reading Assistant', b'Upload Text File')
+
+
+def test_index_with_sessions(client, readonly_session):
+    """Test index page shows recent sessions."""
+    response = client.get('/')
+    assert response.status_code == 200
+    assert_contains_all(response.data, b'Recent Reading Sessions',
+                        readonly_session.filename.encode())
+
+
+@pytest.mark.slow
+def test_file_upload_success(client):
+    """Test successful file upload."""
+    data = {'file': (BytesIO(b'Hello world test content'), 'test.txt')}
+    with mock.patch.object(FileStorage, 'save') as save:
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
     
-    def test_index_page(self, client):
-        """Test the main index page loads correctly."""
-        response = client.get('/')
-        assert response.status_code == 200
-        assert b'Text Reading Assistant' in response.data
-        assert b'Upload Text File' in response.data
+    assert response.status_code == 200
+    response_data = response.get_json()
+    assert response_data['success'] is True
+    assert 'session_id' in response_data
+    # The upload is read from its stream, never written to disk
+    save.assert_not_called()
+
+
+@pytest.mark.slow
+def test_file_upload_no_file(client):
+    """Test file upload without selecting a file."""
+    response = client.post('/upload', data={})
+    assert response.status_code == 400
     
-    def test_index_with_sessions(self, client, sample_session):
-        """Test index page shows recent sessions."""
-        response = client.get('/')
-        assert response.status_code == 200
-        assert b'Recent Reading Sessions' in response.data
-        assert sample_session.filename.encode() in response.data
+    response_data = response.get_json()
+    assert 'error' in response_data
+
+
+@pytest.mark.slow
+def test_file_upload_wrong_extension(client):
+    """Test file upload with wrong file extension."""
+    data = {'file': (BytesIO(b'%PDF-1.4'), 'test.pdf')}
+    with mock.patch.object(FileStorage, 'save') as save:
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
     
-    def test_file_upload_success(self, client):
-        """Test successful file upload."""
-        data = {
-            'file': (tempfile.NamedTemporaryFile(mode='w+', suffix='.txt', delete=False), 
-                    'Hello world test content')
-        }
-        
-        # Write content to temp file
-        with open(data['file'][0].name, 'w') as f:
-            f.write('Hello world test content')
-        
-        with open(data['file'][0].name, 'rb') as f:
-            response = client.post('/upload', data={'file': f})
-        
-        assert response.status_code == 200
-        response_data = json.loads(response.data)
-        assert response_data['success'] is True
-        assert 'session_id' in response_data
-        
-        # Cleanup
-        os.unlink(data['file'][0].name)
-    
-    def test_file_upload_no_file(self, client):
-        """Test file upload without selecting a file."""
-        response = client.post('/upload', data={})
-        assert response.status_code == 400
-        
-        response_data = json.loads(response.data)
-        assert 'error' in response_data
-    
-    def test_file_upload_wrong_extension(self, client):
-        """Test file upload with wrong file extension."""
-        data = {
-            'file': (tempfile.NamedTemporaryFile(mode='w+', suffix='.pdf', delete=False), 
-                    'test.pdf')
-        }
-        
-        with open(data['file'][0].name, 'rb') as f:
-            response = client.post('/upload', data={'file': f})
-        
-        assert response.status_code == 400
-        response_data = json.loads(response.data)
-        assert 'Please upload a .txt file' in response_data['error']
-        
-        # Cleanup
-        os.unlink(data['file'][0].name)
-    
-    def test_reading_session_page(self, client, sample_session):
-        """Test reading session page loads correctly."""
-        response = client.get(f'/session/{sample_session.id}')
-        assert response.status_code == 200
-        assert sample_session.filename.encode() in response.data
-        assert b'Reading Text' in response.data
-    
-    def test_reading_session_not_found(self, client):
-        """Test reading session page with invalid session ID."""
-        response = client.get('/session/invalid-id')
-        assert response.status_code == 404
-
-
-class TestAPIEndpoints:
-    """Test API endpoints."""
-    
-    def test_update_progress_success(self, client, sample_session):
-        """Test successful progress update."""
-        data = {
-            'session_id': sample_session.id,
-            'word_index': 0,
-            'spoken_word': 'hello',
-            'expected_word': 'hello',
-            'confidence': 0.95
-        }
-        
-        response = client.post(f'/api/sessions/{sample_session.id}/progress',
-                              data=json.dumps(data),
-                              content_type='application/json')
-        
-        assert response.status_code == 200
-        response_data = json.loads(response.data)
-        assert response_data['success'] is True
-        assert response_data['is_correct'] is True
-    
-    def test_update_progress_incorrect_word(self, client, sample_session):
-        """Test progress update with incorrect word."""
-        data = {
+    assert response.status_code == 400
+    response_data = response.get_json()
+    assert 'Please upload a .txt file' in response_data['error']
+    save.assert_not_called()
+
+
+def test_reading_session_page(client, readonly_session):
+    """Test reading session page loads correctly."""
+    response = client.get(f'/session/{readonly_session.id}')
+    assert response.status_code == 200
+    assert_contains_all(response.data, readonly_session.filename.encode(), b'Reading Text')
+
+
+def test_reading_session_not_modified(client, readonly_session):
+    """Test revisiting a reading session with a matching ETag returns 304."""
+    response = client.get(f'/session/{readonly_session.id}')
+    etag = response.headers['ETag']
+    
+    response = client.get(f'/session/{readonly_session.id}',
+                          headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_reading_session_page_cache_replaced(client, sample_session):
+    """Test the cached page is replaced, not added to, when the position moves."""
+    first_etag = client.get(f'/session/{sample_session.id}').headers['ETag']
+    
+    sample_session.current_word_index = 3
+    db.session.flush()
+    second_etag = client.get(f'/session/{sample_session.id}').headers['ETag']
+    
+    assert first_etag != second_etag
+    cached_etag, _ = cache.get(f'reading_page:{sample_session.id}')
+    assert f'"{cached_etag}"' == second_etag
+
+
+def test_reading_session_etag_changes_with_templates(client, readonly_session, monkeypatch):
+    """Test a template change on deploy invalidates previously issued ETags."""
+    etag = client.get(f'/session/{readonly_session.id}').headers['ETag']
+    
+    monkeypatch.setattr('app._READING_PAGE_VERSION', 'newbuild')
+    response = client.get(f'/session/{readonly_session.id}',
+                          headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_reading_session_not_found(client):
+    """Test reading session page with invalid session ID."""
+    response = client.get('/session/invalid-id')
+    assert response.status_code == 404
+
+
+# API endpoints
+def test_update_progress_success(client, sample_session):
+    """Test successful progress update."""
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 0,
+        'spoken_word': 'hello',
+        'expected_word': 'hello',
+        'confidence': 0.95
+    }
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    assert response.status_code == 200
+    response_data = response.get_json()
+    assert response_data['success'] is True
+    assert response_data['is_correct'] is True
+
+
+def test_update_progress_incorrect_word(client, sample_session):
+    """Test progress update with incorrect word."""
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 0,
+        'spoken_word': 'goodbye',
+        'expected_word': 'hello',
+        'confidence': 0.85
+    }
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    assert response.status_code == 200
+    response_data = response.get_json()
+    assert response_data['success'] is True
+    assert response_data['is_correct'] is False
+
+
+def test_stale_progress_flushed_by_next_request(client, sample_session, monkeypatch):
+    """Test progress buffered past the flush interval is written by another session's update."""
+    other_session = ReadingSession(filename='other.txt', text_content='hello again', total_words=2)
+    db.session.add(other_session)
+    db.session.flush()
+    
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 0,
+        'spoken_word': 'hello'
+    }
+    monkeypatch.setitem(app.config, 'PROGRESS_FLUSH_INTERVAL', 60)
+    client.post(f'/api/sessions/{sample_session.id}/progress', json=data)
+    assert len(sample_session.progress_entries) == 0
+    
+    # Unrelated requests leave the buffer alone
+    monkeypatch.setitem(app.config, 'PROGRESS_FLUSH_INTERVAL', 0)
+    client.get('/')
+    db.session.expire(sample_session)
+    assert len(sample_session.progress_entries) == 0
+    
+    data = {
+        'session_id': other_session.id,
+        'word_index': 0,
+        'spoken_word': 'hello'
+    }
+    client.post(f'/api/sessions/{other_session.id}/progress', json=data)
+    db.session.expire(sample_session)
+    assert len(sample_session.progress_entries) == 1
+
+
+def test_failed_progress_flush_keeps_entries(client, sample_session, monkeypatch):
+    """Test buffered progress survives a failed write and is written on retry."""
+    monkeypatch.setitem(app.config, 'PROGRESS_FLUSH_INTERVAL', 60)
+    for word_index, spoken_word in enumerate(['hello', 'world']):
+        client.post(f'/api/sessions/{sample_session.id}/progress', json={
             'session_id': sample_session.id,
-            'word_index': 0,
-            'spoken_word': 'goodbye',
-            'expected_word': 'hello',
-            'confidence': 0.85
-        }
-        
-        response = client.post(f'/api/sessions/{sample_session.id}/progress',
-                              data=json.dumps(data),
-                              content_type='application/json')
-        
-        assert response.status_code == 200
-        response_data = json.loads(response.data)
-        assert response_data['success'] is True
-        assert response_data['is_correct'] is False
-    
-    def test_complete_session(self, client, sample_session):
-        """Test session completion."""
-        response = client.post(f'/api/sessions/{sample_session.id}/complete',
-                              content_type='application/json')
-        
-        assert response.status_code == 200
-        response_data = json.loads(response.data)
-        assert response_data['success'] is True
-        assert 'statistics' in response_data
-        
-        # Verify session is marked as completed
-        updated_session = ReadingSession.query.get(sample_session.id)
-        assert updated_session.completed_at is not None
-
-
-class TestDatabaseModels:
-    """Test database models and relationships."""
-    
-    def test_reading_session_creation(self):
-        """Test ReadingSession model creation."""
-        session = ReadingSession(
-            filename='test.txt',
-            text_content='test content',
-            total_words=2
-        )
-        db.session.add(session)
-        db.session.commit()
-        
-        assert session.id is not None
-        assert session.filename == 'test.txt'
-        assert session.total_words == 2
-        assert session.current_word_index == 0
-    
-    def test_reading_session_to_dict(self, sample_session):
-        """Test ReadingSession to_dict method."""
-        session_dict = sample_session.to_dict()
-        
-        assert 'id' in session_dict
-        assert 'filename' in session_dict
-        assert 'total_words' in session_dict
-        assert 'progress_percentage' in session_dict
-        assert session_dict['progress_percentage'] == 0.0
-    
-    def test_reading_progress_creation(self, sample_session):
-        """Test ReadingProgress model creation."""
-        progress = ReadingProgress(
-            session_id=sample_session.id,
-            word_index=0,
-            expected_word='hello',
-            spoken_word='hello',
-            is_correct=True,
-            confidence_score=0.95
-        )
-        db.session.add(progress)
-        db.session.commit()
-        
-        assert progress.id is not None
-        assert progress.session_id == sample_session.id
-        assert progress.is_correct is True
-        assert progress.confidence_score == 0.95
-    
-    def test_session_progress_relationship(self, sample_session):
-        """Test relationship between ReadingSession and ReadingProgress."""
-        # Add progress entries
-        progress1 = ReadingProgress(
-            session_id=sample_session.id,
-            word_index=0,
-            expected_word='hello',
-            spoken_word='hello',
-            is_correct=True
-        )
-        progress2 = ReadingProgress(
-            session_id=sample_session.id,
-            word_index=1,
-            expected_word='world',
-            spoken_word='word',
-            is_correct=False
-        )
-        
-        db.session.add_all([progress1, progress2])
-        db.session.commit()
-        
-        # Test relationship
-        assert len(sample_session.progress_entries) == 2
-        assert progress1.session == sample_session
-        assert progress2.session == sample_session
-
-
-class TestUtilityFunctions:
-    """Test utility functions."""
-    
-    def test_words_match_exact(self):
-        """Test word matching with exact match."""
-        from app import _words_match
-        assert _words_match('hello', 'hello') is True
-    
-    def test_words_match_different(self):
-        """Test word matching with different words."""
-        from app import _words_match
-        assert _words_match('hello', 'world') is False
-    
-    def test_words_match_variations(self):
-        """Test word matching with common variations."""
-        from app import _words_match
-        # Test -ing variation
-        assert _words_match('runnin', 'running') is True
-        # Test -ed variation  
-        assert _words_match('walkd', 'walked') is True
-        # Test th/f variation
-        assert _words_match('free', 'three') is True
-
-
-class TestErrorHandling:
-    """Test error handling and edge cases."""
-    
-    def test_404_error_handler(self, client):
-        """Test 404 error handler."""
-        response = client.get('/nonexistent-page')
-        assert response.status_code == 404
-        assert b'Page not found' in response.data
-    
-    def test_api_with_invalid_session(self, client):
-        """Test API calls with invalid session ID."""
-        data = {
-            'session_id': 'invalid-id',
-            'word_index': 0,
-            'spoken_word': 'test',
-            'expected_word': 'test',
-            'confidence': 0.95
-        }
-        
-        response = client.post('/api/sessions/invalid-id/progress',
-                              data=json.dumps(data),
-                              content_type='application/json')
-        
-        assert response.status_code == 404
-    
-    def test_malformed_json_request(self, client, sample_session):
-        """Test API with malformed JSON."""
-        response = client.post(f'/api/sessions/{sample_session.id}/progress',
-                              data='invalid json',
-                              content_type='application/json')
-        
-        assert response.status_code == 400
-
-
-class TestSpeechRecognitionLogic:
-    """Test speech recognition related functionality."""
-    
-    def test_word_preprocessing(self):
-        """Test word preprocessing for speech recognition."""
-        import re
-        # Test punctuation removal
-        word = "hello!"
-        cleaned = re.sub(r'[^\w\s]', '', word.lower())
-        # This would be done in JavaScript, but we can test the concept
-        assert len(word) > len(word.replace('!', ''))
-        assert cleaned == 'hello'
-    
-    def test_confidence_scoring(self, client, sample_session):
-        """Test different confidence scores."""
-        # High confidence
+            'word_index': word_index,
+            'spoken_word': spoken_word
+        })
+    
+    locked = OperationalError('INSERT', {}, Exception('database is locked'))
+    with mock.patch.object(db.session, 'bulk_save_objects', side_effect=locked):
+        response = client.post(f'/api/sessions/{sample_session.id}/complete')
+    assert response.status_code == 500
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/complete')
+    assert response.get_json()['statistics']['total_attempts'] == 2
+
+
+def test_update_progress_uses_stored_text(client, sample_session):
+    """Test the expected word is taken from the session text, not the request."""
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 1,
+        'spoken_word': 'hello',
+        'expected_word': 'hello',
+        'confidence': 0.9
+    }
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    response_data = response.get_json()
+    assert response_data['is_correct'] is False
+
+
+def test_update_progress_ignores_punctuation(client, db_session):
+    """Test spoken words match stored words containing punctuation."""
+    session = ReadingSession(
+        filename='punctuation.txt',
+        text_content="Don't panic, it's well-known.",
+        total_words=4
+    )
+    db_session.add(session)
+    db_session.flush()
+    
+    for word_index, spoken_word in enumerate(["don't", 'panic', "it's", 'well-known']):
+        response = client.post(f'/api/sessions/{session.id}/progress', json={
+            'session_id': session.id,
+            'word_index': word_index,
+            'spoken_word': spoken_word
+        })
+        assert response.get_json()['is_correct'] is True
+    
+    # Progress keeps the word as written in the text
+    client.post(f'/api/sessions/{session.id}/complete')
+    entries = db_session.execute(
+        db.select(ReadingProgress.expected_word)
+        .where(ReadingProgress.session_id == session.id)
+        .order_by(ReadingProgress.word_index)
+    ).scalars().all()
+    assert entries == ["Don't", 'panic,', "it's", 'well-known.']
+
+
+def test_update_progress_invalid_word_index(client, sample_session):
+    """Test progress update with a word index outside the text."""
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 6,
+        'spoken_word': 'test',
+        'confidence': 0.9
+    }
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('event', [
+    {'word_index': True, 'spoken_word': 'world'},
+    {'word_index': 0, 'spoken_word': None},
+    {'word_index': 0, 'spoken_word': 42},
+    {'word_index': 0, 'spoken_word': 'hello', 'confidence': 'high'},
+])
+def test_update_progress_invalid_event(client, sample_session, event):
+    """Test malformed progress events are rejected instead of failing the request."""
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json={'session_id': sample_session.id, **event})
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_bulk_update_progress(client, sample_session):
+    """Test replaying several progress events in one request."""
+    data = {'events': [
+        {'word_index': 0, 'spoken_word': 'hello', 'confidence': 0.9},
+        {'word_index': 1, 'spoken_word': 'word', 'confidence': 0.6},
+        {'word_index': 2, 'spoken_word': 'this', 'confidence': 0.8}
+    ]}
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress/bulk',
+                          json=data)
+    
+    assert response.status_code == 200
+    response_data = response.get_json()
+    assert response_data['recorded'] == 3
+    assert response_data['correct'] == 2
+    assert len(sample_session.progress_entries) == 3
+    assert sample_session.current_word_index == 2
+
+
+@pytest.mark.parametrize('entry', [
+    'bad',
+    {'word_index': 0, 'spoken_word': 42},
+    {'word_index': True, 'spoken_word': 'world'},
+    {'word_index': 0, 'spoken_word': 'hello', 'confidence': 'high'},
+])
+def test_bulk_update_progress_invalid_event(client, sample_session, entry):
+    """Test malformed bulk progress events are rejected."""
+    response = client.post(f'/api/sessions/{sample_session.id}/progress/bulk',
+                          json={'events': [entry]})
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_bulk_update_progress_ignores_punctuation(client, db_session):
+    """Test bulk events match stored words containing punctuation."""
+    session = ReadingSession(
+        filename='punctuation.txt',
+        text_content="Don't stop",
+        total_words=2
+    )
+    db_session.add(session)
+    db_session.flush()
+    
+    response = client.post(f'/api/sessions/{session.id}/progress/bulk', json={'events': [
+        {'word_index': 0, 'spoken_word': "don't"},
+        {'word_index': 1, 'spoken_word': 'stop'}
+    ]})
+    
+    assert response.get_json()['correct'] == 2
+    assert [entry.expected_word for entry in session.progress_entries] == ["Don't", 'stop']
+
+
+def test_complete_session(client, sample_session):
+    """Test session completion."""
+    response = client.post(f'/api/sessions/{sample_session.id}/complete',
+                          content_type='application/json')
+    
+    assert response.status_code == 200
+    response_data = response.get_json()
+    assert response_data['success'] is True
+    assert 'statistics' in response_data
+    
+    # Verify session is marked as completed, reloading it from the database
+    db.session.expire(sample_session)
+    updated_session = db.session.get(ReadingSession, sample_session.id)
+    assert updated_session.completed_at is not None
+
+
+def test_complete_session_write_error(client, sample_session):
+    """Test a failed write is reported instead of a successful completion."""
+    locked = OperationalError('COMMIT', {}, Exception('database is locked'))
+    with mock.patch.object(db.session, 'commit', side_effect=locked):
+        response = client.post(f'/api/sessions/{sample_session.id}/complete')
+    
+    assert response.status_code == 500
+    assert 'error' in response.get_json()
+
+
+def test_teardown_commit_error_keeps_response(client):
+    """Test a failing safety-net commit at teardown does not replace the response."""
+    locked = OperationalError('COMMIT', {}, Exception('database is locked'))
+    with mock.patch.object(db.session, 'commit', side_effect=locked):
+        response = client.get('/static/css/style.css')
+    
+    assert response.status_code == 200
+
+
+def test_complete_session_flushes_pending_progress(client, sample_session):
+    """Test buffered progress entries are written before statistics are computed."""
+    for word_index, spoken_word in enumerate(['hello', 'word']):
         data = {
             'session_id': sample_session.id,
-            'word_index': 0,
-            'spoken_word': 'hello',
-            'expected_word': 'hello',
-            'confidence': 0.98
+            'word_index': word_index,
+            'spoken_word': spoken_word,
+            'expected_word': ['hello', 'world'][word_index],
+            'confidence': 0.9
         }
-        
-        response = client.post(f'/api/sessions/{sample_session.id}/progress',
-                              data=json.dumps(data),
-                              content_type='application/json')
-        
-        response_data = json.loads(response.data)
-        assert response_data['is_correct'] is True
-        
-        # Low confidence with correct word should still be accepted
-        data['confidence'] = 0.3
-        response = client.post(f'/api/sessions/{sample_session.id}/progress',
-                              data=json.dumps(data),
-                              content_type='application/json')
-        
-        response_data = json.loads(response.data)
-        assert response_data['is_correct'] is True
+        client.post(f'/api/sessions/{sample_session.id}/progress',
+                    json=data)
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/complete',
+                          content_type='application/json')
+    
+    statistics = response.get_json()['statistics']
+    assert statistics['total_attempts'] == 2
+    assert statistics['correct_words'] == 1
+    assert sample_session.current_word_index == 1
+
+
+# Database models and relationships
+def test_reading_session_creation(db_session):
+    """Test ReadingSession model creation."""
+    session = ReadingSession(
+        filename='test.txt',
+        text_content='test content',
+        total_words=2
+    )
+    db.session.add(session)
+    db.session.commit()
+    
+    assert session.id is not None
+    assert session.filename == 'test.txt'
+    assert session.total_words == 2
+    assert session.current_word_index == 0
+
+
+def test_reading_session_to_dict(readonly_session):
+    """Test ReadingSession to_dict method."""
+    session_dict = readonly_session.to_dict()
+    
+    assert 'id' in session_dict
+    assert 'filename' in session_dict
+    assert 'total_words' in session_dict
+    assert 'progress_percentage' in session_dict
+    assert session_dict['progress_percentage'] == 0.0
+
+
+def test_reading_session_to_dict_progress_is_float(db_session):
+    """Test progress_percentage is a float before and after the row is flushed."""
+    session = ReadingSession(
+        filename='progress.txt',
+        text_content='one two three four',
+        total_words=4,
+        current_word_index=0,
+        created_at=datetime(2024, 1, 1)
+    )
+    assert session.to_dict()['progress_percentage'] == 25.0
+    
+    db_session.add(session)
+    db_session.flush()
+    db_session.expire(session)
+    progress = session.to_dict()['progress_percentage']
+    assert isinstance(progress, float)
+    assert progress == 25.0
+
+
+def test_identical_texts_share_blob(client, sample_session):
+    """Test sessions with the same text reference a single TextBlob."""
+    session = ReadingSession(
+        filename='copy.txt',
+        text_content=sample_session.text_content,
+        total_words=6
+    )
+    db.session.add(session)
+    db.session.commit()
+    
+    assert session.text_sha256 == sample_session.text_sha256
+    assert db.session.query(TextBlob).filter_by(sha256=session.text_sha256).count() == 1
+
+
+@pytest.mark.parametrize('inserts', [_INSERTS, {}], ids=['on_conflict', 'fallback'])
+def test_text_blob_for_content_reuses_blob(db_session, monkeypatch, inserts):
+    """Test repeated calls for one text return the same blob on both insert paths."""
+    monkeypatch.setattr('app._INSERTS', inserts)
+    first = TextBlob.for_content('the same text')
+    second = TextBlob.for_content('the same text')
+    
+    assert first is second
+    db_session.flush()
+    assert db_session.query(TextBlob).filter_by(sha256=first.sha256).count() == 1
+
+
+def test_reading_progress_creation(sample_session):
+    """Test ReadingProgress model creation."""
+    progress = ReadingProgress(
+        session_id=sample_session.id,
+        word_index=0,
+        expected_word='hello',
+        spoken_word='hello',
+        is_correct=True,
+        confidence_score=0.95
+    )
+    db.session.add(progress)
+    db.session.commit()
+    
+    assert progress.id is not None
+    assert progress.session_id == sample_session.id
+    assert progress.is_correct is True
+    assert progress.confidence_score == 0.95
+
+
+def test_session_progress_relationship(sample_session):
+    """Test relationship between ReadingSession and ReadingProgress."""
+    # Add progress entries
+    progress1 = ReadingProgress(
+        session_id=sample_session.id,
+        word_index=0,
+        expected_word='hello',
+        spoken_word='hello',
+        is_correct=True
+    )
+    progress2 = ReadingProgress(
+        session_id=sample_session.id,
+        word_index=1,
+        expected_word='world',
+        spoken_word='word',
+        is_correct=False
+    )
+    
+    db.session.add_all([progress1, progress2])
+    db.session.flush()
+    
+    # Test relationship
+    assert len(sample_session.progress_entries) == 2
+    assert progress1.session == sample_session
+    assert progress2.session == sample_session
+
+
+# Utility functions
+@pytest.mark.parametrize('spoken, expected, want', [
+    ('hello', 'hello', True),      # exact match
+    ('hello', 'world', False),     # different words
+    ('runnin', 'running', True),   # -ing variation
+    ('walkd', 'walked', True),     # -ed variation
+    ('free', 'three', True),       # th/f variation
+])
+def test_words_match(spoken, expected, want):
+    """Test word matching with exact matches, mismatches and common variations."""
+    assert _words_match(spoken, expected) is want
+
+
+def test_read_upload_across_chunks(monkeypatch):
+    """Test streamed upload decoding with words and characters split across chunks."""
+    text = 'héllo  wörld\nthis is   a tést '
+    monkeypatch.setitem(app.config, 'UPLOAD_CHUNK_SIZE', 3)
+    content, total_words, sha256 = _read_upload(BytesIO(text.encode('utf-8')))
+    assert content == text
+    assert total_words == len(text.split())
+    assert sha256 == hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def test_session_words_cache_bounded_by_words(db_session):
+    """Test a text larger than the word cache is split but not kept in it."""
+    max_words = app.config['WORD_CACHE_MAX_WORDS']
+    blob = TextBlob.for_content('word ' * (max_words + 1))
+    
+    assert len(_session_words(blob.sha256)) == max_words + 1
+    assert _session_words.cache.get(hashkey(blob.sha256)) is None
+    assert _session_words.cache.currsize <= max_words
+
+
+# Vercel session store
+def test_session_store_local_backend():
+    """Test the process-local store round-trips sessions and evicts past maxsize."""
+    store = SessionStore(ttl=60, maxsize=1)
+    session_data = {'id': 'abc', 'created_at': datetime(2024, 1, 1)}
+    
+    store.set('abc', session_data)
+    assert store.get('abc') == session_data
+    assert store.get('missing') is None
+    
+    store.set('def', {'id': 'def'})
+    assert store.get('abc') is None
+
+
+def test_session_store_redis_backend():
+    """Test the Redis store serialises with orjson under a namespaced key."""
+    redis_client = mock.Mock()
+    with mock.patch('redis.Redis.from_url', return_value=redis_client):
+        store = SessionStore('redis://localhost:6379/0', ttl=60)
+    
+    store.set('abc', {'id': 'abc', 'words': ['hello'], 'created_at': datetime(2024, 1, 1)})
+    key, payload = redis_client.set.call_args.args
+    assert key == 'sess:abc'
+    assert redis_client.set.call_args.kwargs == {'ex': 60}
+    
+    # Datetimes come back as ISO strings
+    redis_client.get.return_value = payload
+    assert store.get('abc') == {'id': 'abc', 'words': ['hello'], 'created_at': '2024-01-01T00:00:00'}
+    redis_client.get.assert_called_with('sess:abc')
+    
+    redis_client.get.return_value = None
+    assert store.get('missing') is None
+
+
+# Error handling and edge cases
+def test_404_error_handler(client):
+    """Test 404 error handler."""
+    response = client.get('/nonexistent-page')
+    assert response.status_code == 404
+    assert b'Page not found' in response.data
+
+
+def test_api_with_invalid_session(client):
+    """Test API calls with invalid session ID."""
+    data = {
+        'session_id': 'invalid-id',
+        'word_index': 0,
+        'spoken_word': 'test',
+        'expected_word': 'test',
+        'confidence': 0.95
+    }
+    
+    response = client.post('/api/sessions/invalid-id/progress',
+                          json=data)
+    
+    assert response.status_code == 404
+
+
+def test_malformed_json_request(client, sample_session):
+    """Test API with malformed JSON."""
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          data='invalid json',
+                          content_type='application/json')
+    
+    assert response.status_code == 400
+
+
+# Speech recognition related functionality
+def test_word_preprocessing():
+    """Test word preprocessing for speech recognition."""
+    # Test punctuation removal
+    word = "hello!"
+    cleaned = _PUNCT_RE.sub('', word.lower())
+    # The reading page does the same in JavaScript
+    assert len(word) > len(word.replace('!', ''))
+    assert cleaned == 'hello'
+
+
+def test_confidence_scoring(client, sample_session):
+    """Test different confidence scores."""
+    # High confidence
+    data = {
+        'session_id': sample_session.id,
+        'word_index': 0,
+        'spoken_word': 'hello',
+        'expected_word': 'hello',
+        'confidence': 0.98
+    }
+    
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    response_data = response.get_json()
+    assert response_data['is_correct'] is True
+    
+    # Low confidence with correct word should still be accepted
+    data['confidence'] = 0.3
+    response = client.post(f'/api/sessions/{sample_session.id}/progress',
+                          json=data)
+    
+    response_data = response.get_json()
+    assert response_data['is_correct'] is True
 
 
 if __name__ == '__main__':